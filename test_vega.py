@@ -67,6 +67,29 @@ def test_engine_creation():
         print(f"  FAIL: {e}")
         return False
 
+def test_clean_xml():
+    """Test 6: Check XML is pulled out of typical model replies."""
+    print("Test 6: Cleaning model replies...")
+    from vega_generator.engine import VegaEngine
+    engine = VegaEngine(api_key='test')
+    doc = '<?xml version="1.0"?>\n<testplan name="t">\n</testplan>'
+    cases = [
+        ("bare document", doc, doc),
+        ("xml fence", f"```xml\n{doc}\n```", doc),
+        ("plain fence", f"```\n{doc}\n```", doc),
+        ("prose before fence", f"Here is the `<testplan>` document:\n```xml\n{doc}\n```", doc),
+        ("stray fence before xml fence", f"Use ```<b>``` then ```xml\n{doc}\n```", doc),
+        ("shell fence before document", f"```bash\nls\n```\n{doc}", doc),
+        ("prose around document", f"Sure!\n{doc}\nDone.", doc),
+    ]
+    failed = [name for name, reply, expected in cases
+              if engine._clean_xml(reply) != expected]
+    if failed:
+        print(f"  FAIL: {', '.join(failed)}")
+        return False
+    print(f"  PASS: {len(cases)} replies cleaned")
+    return True
+
 def main():
     print("")
     print("=" * 60)
@@ -81,6 +104,7 @@ def main():
     results.append(test_api_key())
     results.append(test_pdf_exists())
     results.append(test_engine_creation())
+    results.append(test_clean_xml())
     
     print("")
     print("=" * 60)
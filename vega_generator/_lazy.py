@@ -0,0 +1,49 @@
+"""
+VEGA Lazy Imports
+Defer importing a module until one of its attributes is first used.
+
+Keeps `python -m vega_generator.cli --help` from loading the
+provider SDKs (anthropic, openai) and other modules it never needs.
+"""
+
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Module proxy that imports the real module on first attribute access.
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_lazy_loaded'] = False
+
+    def _load(self):
+        """Import the real module once and copy its namespace in."""
+        module = importlib.import_module(self.__name__)
+        # After this, attribute lookups hit __dict__ and skip __getattr__
+        self.__dict__.update(module.__dict__)
+        self.__dict__['_lazy_loaded'] = True
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_lazy_loaded'] else 'not loaded'
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name):
+    """
+    Return the module if already imported, otherwise a LazyModule proxy.
+
+    Args:
+        name: Fully qualified module name, e.g. 'anthropic'
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
@@ -0,0 +1,16 @@
+"""
+VEGA Model Registry
+Supported generation backends and the API keys they read.
+
+Kept free of other imports so the CLI can validate --model without
+loading the engine.
+"""
+
+# model -> environment variable holding its API key
+MODEL_API_KEYS = {
+    'claude': 'ANTHROPIC_API_KEY',
+    'openai': 'OPENAI_API_KEY',
+    'openai-assistant': 'OPENAI_API_KEY',
+}
+
+SUPPORTED_MODELS = tuple(MODEL_API_KEYS)
@@ -12,51 +12,79 @@ Usage:
 import sys
 import os
 
-from .engine import VegaEngine
+from ._models import SUPPORTED_MODELS
+
+
+_RULE = "=" * 60
+
+_BANNER = "\n".join([
+    "",
+    _RULE,
+    "   VEGA XTP Generator v2.0",
+    "   AI-Powered Test Plan Generation from PDF",
+    "",
+    "   Supported Models:",
+    "     - claude           (Anthropic Claude)",
+    "     - openai           (OpenAI GPT-4)",
+    "     - openai-assistant (OpenAI with file storage)",
+    "",
+    "   From: Cognitive Verification Architecture",
+    "   Author: Vikash",
+    _RULE,
+    "",
+])
+
+_USAGE = "\n".join([
+    "",
+    "Usage:",
+    "    python -m vega_generator.cli <pdf_file> [options]",
+    "",
+    "Options:",
+    "    --model <name>    Model to use (default: claude)",
+    "                      claude, openai, openai-assistant",
+    "    --output <file>   Output file path",
+    "    --skip-current    Keep an existing valid output newer than the PDF",
+    "    --no-cache        Always call the model; ignore cached results",
+    "    --help            Show this help",
+    "",
+    "Examples:",
+    "    python -m vega_generator.cli spec.pdf",
+    "    python -m vega_generator.cli spec.pdf --model openai-assistant",
+    "    python -m vega_generator.cli spec.pdf --model claude --output my_plan.xtp",
+    "",
+    "Environment Variables:",
+    "    ANTHROPIC_API_KEY    For Claude model",
+    "    OPENAI_API_KEY       For OpenAI models",
+    "",
+    "Model Recommendations:",
+    "    - Small PDFs (<500KB):  Use 'claude' or 'openai'",
+    "    - Large PDFs (>500KB):  Use 'openai-assistant'",
+    "    - Best quality:         Use 'claude'",
+    "    - File stays in memory: Use 'openai-assistant'",
+    "",
+    "",
+])
 
 
 def print_banner():
-    print("")
-    print("=" * 60)
-    print("   VEGA XTP Generator v2.0")
-    print("   AI-Powered Test Plan Generation from PDF")
-    print("")
-    print("   Supported Models:")
-    print("     - claude           (Anthropic Claude)")
-    print("     - openai           (OpenAI GPT-4)")
-    print("     - openai-assistant (OpenAI with file storage)")
-    print("")
-    print("   From: Cognitive Verification Architecture")
-    print("   Author: Vikash")
-    print("=" * 60)
+    sys.stdout.write(_BANNER)
 
 
 def print_usage():
-    print("")
-    print("Usage:")
-    print("    python -m vega_generator.cli <pdf_file> [options]")
-    print("")
-    print("Options:")
-    print("    --model <name>    Model to use (default: claude)")
-    print("                      claude, openai, openai-assistant")
-    print("    --output <file>   Output file path")
-    print("    --help            Show this help")
-    print("")
-    print("Examples:")
-    print("    python -m vega_generator.cli spec.pdf")
-    print("    python -m vega_generator.cli spec.pdf --model openai-assistant")
-    print("    python -m vega_generator.cli spec.pdf --model claude --output my_plan.xtp")
-    print("")
-    print("Environment Variables:")
-    print("    ANTHROPIC_API_KEY    For Claude model")
-    print("    OPENAI_API_KEY       For OpenAI models")
-    print("")
-    print("Model Recommendations:")
-    print("    - Small PDFs (<500KB):  Use 'claude' or 'openai'")
-    print("    - Large PDFs (>500KB):  Use 'openai-assistant'")
-    print("    - Best quality:         Use 'claude'")
-    print("    - File stays in memory: Use 'openai-assistant'")
-    print("")
+    sys.stdout.write(_USAGE)
+
+
+# flag -> (result key, takes a value)
+_FLAG_HANDLERS = {
+    '--help': ('help', False),
+    '-h': ('help', False),
+    '--model': ('model', True),
+    '-m': ('model', True),
+    '--output': ('output', True),
+    '-o': ('output', True),
+    '--skip-current': ('skip_current', False),
+    '--no-cache': ('no_cache', False),
+}
 
 
 def parse_args(args):
@@ -65,22 +93,23 @@ def parse_args(args):
         'pdf_path': None,
         'model': 'claude',
         'output': None,
+        'skip_current': False,
+        'no_cache': False,
         'help': False
     }
     
     i = 0
-    while i < len(args):
+    n = len(args)
+    while i < n:
         arg = args[i]
+        spec = _FLAG_HANDLERS.get(arg)
         
-        if arg == '--help' or arg == '-h':
-            result['help'] = True
-        elif arg == '--model' or arg == '-m':
-            if i + 1 < len(args):
-                result['model'] = args[i + 1]
-                i += 1
-        elif arg == '--output' or arg == '-o':
-            if i + 1 < len(args):
-                result['output'] = args[i + 1]
+        if spec is not None:
+            name, takes_value = spec
+            if not takes_value:
+                result[name] = True
+            elif i + 1 < n:
+                result[name] = args[i + 1]
                 i += 1
         elif not arg.startswith('-'):
             if result['pdf_path'] is None:
@@ -109,7 +138,11 @@ def main():
     model = args['model']
     output = args['output']
     
-    if not os.path.exists(pdf_path):
+    # Fail before building the engine, which would complain about a
+    # missing API key first
+    try:
+        os.stat(pdf_path)
+    except OSError:
         print(f"ERROR: File not found: {pdf_path}")
         sys.exit(1)
     
@@ -117,9 +150,9 @@ def main():
         print(f"ERROR: File must be a PDF: {pdf_path}")
         sys.exit(1)
     
-    if model not in VegaEngine.SUPPORTED_MODELS:
+    if model not in SUPPORTED_MODELS:
         print(f"ERROR: Unknown model: {model}")
-        print(f"Supported: {', '.join(VegaEngine.SUPPORTED_MODELS)}")
+        print(f"Supported: {', '.join(SUPPORTED_MODELS)}")
         sys.exit(1)
     
     print(f"PDF:   {pdf_path}")
@@ -127,9 +160,16 @@ def main():
     if output:
         print(f"Output: {output}")
     
+    # Imported here so --help and argument errors never load the engine
+    from .engine import VegaEngine
+    
     engine = VegaEngine(model=model)
     
-    success = engine.generate_xtp(pdf_path, output)
+    success = engine.generate_xtp(
+        pdf_path, output,
+        skip_current=args['skip_current'],
+        use_cache=not args['no_cache']
+    )
     
     if success:
         print("")
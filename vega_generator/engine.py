@@ -10,9 +10,292 @@ From: "Cognitive Verification Architecture: The VEGA Framework"
 Author: Vikash
 """
 
+import binascii
+import functools
+import hashlib
+import io
+import mmap
 import os
-import base64
-import time
+import re
+import stat
+
+from ._lazy import lazy_import
+from ._models import MODEL_API_KEYS, SUPPORTED_MODELS
+
+time = lazy_import("time")
+anthropic = lazy_import("anthropic")
+_openai = lazy_import("openai")
+asyncio = lazy_import("asyncio")
+futures = lazy_import("concurrent.futures")
+threading = lazy_import("threading")
+
+# Read size for streaming base64; a multiple of 3 so chunks need no padding
+_PDF_CHUNK_SIZE = 3 * 1024 * 1024
+
+# Claude request settings shared by the single-PDF, batch and async paths.
+# Output is billed as generated, so the ceiling only costs when a plan
+# needs the room; 16000 stays under the SDK's limit for non-streamed calls.
+_CLAUDE_MODEL = "claude-sonnet-4-20250514"
+_CLAUDE_MAX_TOKENS = 16000
+
+# OpenAI model shared by the chat and assistant paths
+_OPENAI_MODEL = "gpt-4o"
+
+# Seconds between Message Batches status checks
+_BATCH_POLL_INTERVAL = 30
+
+# Assistant run polling: seconds before the first retry, growth, ceiling
+_POLL_INITIAL_DELAY = 0.25
+_POLL_BACKOFF = 1.5
+_POLL_MAX_DELAY = 5.0
+
+# Used by _clean_xml, tried in order; the first pattern that matches wins.
+# Fences come first so prose mentioning <testplan> before the real fenced
+# document cannot pull the prose in. A bare ``` fence must hold a tag, so
+# a shell or text snippet fenced earlier in the reply is skipped.
+_RE_XTP_PATTERNS = tuple(re.compile(pattern, re.DOTALL) for pattern in (
+    r'```xml\s*(.*?)\s*```',
+    r'```\s*(<.*?)\s*```',
+    r'(<\?xml.*</testplan>)',
+    r'(<testplan.*</testplan>)',
+))
+
+
+# Used by _ensure_complete_xml to close off a truncated response, and to
+# spot the end of a streamed reply
+_CLOSE_TEST_CASE = '</test_case>'
+_CLOSE_TEST_CASE_LEN = len(_CLOSE_TEST_CASE)
+_CLOSE_TESTPLAN = '</testplan>'
+_CLOSE_TESTPLAN_LEN = len(_CLOSE_TESTPLAN)
+_CLOSE_TESTPLAN_TAIL = '\n    </test_suite>\n</testplan>'
+
+# Generation prompt shared by all models; only {filename} is substituted
+_PROMPT_TMPL = """Analyze the specification document: {filename}
+
+Generate a comprehensive XTP (XML Test Plan) with:
+1. All requirements extracted from the document
+2. Test suites for each feature
+3. Test cases with stimulus and expected results
+4. Cross-feature integration tests
+
+OUTPUT FORMAT (valid XML only, no markdown):
+
+<?xml version="1.0" encoding="UTF-8"?>
+<testplan name="{filename}_verification" version="1.0">
+    <metadata>
+        <author>VEGA XTP Generator</author>
+        <methodology>Cognitive Verification Architecture</methodology>
+        <book>Cognitive Verification Architecture: The VEGA Framework by Vikash</book>
+        <source>{filename}</source>
+    </metadata>
+    
+    <requirements>
+        <requirement id="REQ_001" source="page X">[Requirement]</requirement>
+    </requirements>
+    
+    <test_suite name="[feature]_tests">
+        <test_case id="TC_001" name="[name]">
+            <objective>[objective]</objective>
+            <source>Page X</source>
+            <preconditions>
+                <condition>[condition]</condition>
+            </preconditions>
+            <stimulus>
+                <step order="1">[step]</step>
+                <step order="2">[step]</step>
+            </stimulus>
+            <expected_results>
+                <result>[result]</result>
+            </expected_results>
+            <pass_criteria>[criteria]</pass_criteria>
+        </test_case>
+    </test_suite>
+    
+    <test_suite name="cross_feature_tests">
+        <test_case id="TC_CF_001" name="[cross-feature test]">
+            <objective>[Test interaction between features]</objective>
+            <features_involved>[Feature A, Feature B]</features_involved>
+            <stimulus>
+                <step order="1">[step]</step>
+            </stimulus>
+            <expected_results>
+                <result>[result]</result>
+            </expected_results>
+        </test_case>
+    </test_suite>
+</testplan>
+
+IMPORTANT:
+- Extract ALL requirements
+- Include timing from diagrams
+- Reference page numbers
+- Include cross-feature tests
+- Output ONLY valid XML, no explanations"""
+
+# System instructions for the assistant created by _generate_with_assistant
+_ASSISTANT_INSTRUCTIONS = """You are an expert hardware verification engineer.
+Your task is to analyze hardware specifications and generate comprehensive XML test plans.
+Always output valid XML. Include requirements, test suites, and test cases.
+Reference page numbers from the source document."""
+
+# Part of every cache file name, per model family, so changing a model or
+# its prompt misses old entries instead of serving results from the old ones
+_CACHE_VERSIONS = {
+    model: hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()[:12]
+    for model, parts in {
+        'claude': (_CLAUDE_MODEL, _PROMPT_TMPL),
+        'openai': (_OPENAI_MODEL, _PROMPT_TMPL),
+        'openai-assistant': (_OPENAI_MODEL, _ASSISTANT_INSTRUCTIONS, _PROMPT_TMPL),
+    }.items()
+}
+
+
+# Placeholder written by _create_empty_xtp when nothing usable came back
+_EMPTY_XTP_TMPL = '''<?xml version="1.0" encoding="UTF-8"?>
+<testplan name="{filename}_verification" version="1.0">
+    <metadata>
+        <author>VEGA XTP Generator</author>
+        <source>{filename}</source>
+        <note>Generation incomplete - please retry</note>
+    </metadata>
+    <requirements>
+        <requirement id="REQ_001" source="manual">Review specification manually</requirement>
+    </requirements>
+    <test_suite name="placeholder_tests">
+        <test_case id="TC_001" name="placeholder">
+            <objective>Placeholder - generation incomplete</objective>
+        </test_case>
+    </test_suite>
+</testplan>'''
+
+
+def _write_file(path, text):
+    """
+    Write text as UTF-8 in one buffer, bypassing the text-mode wrapper.
+    The data goes to a temporary file that then replaces path, so a crash
+    never leaves a partial file behind. A symlinked path is written
+    through to its target, and an existing file keeps its permissions.
+    """
+    data = memoryview(text.encode('utf-8'))
+    # Replace the link's target, not the link itself
+    path = os.path.realpath(path)
+    # Unique per process and thread so concurrent writers never collide
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    # 0o666 like open(); the umask still applies
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        try:
+            # os.write may write less than asked; loop until done
+            while data:
+                data = data[os.write(fd, data):]
+        finally:
+            os.close(fd)
+        try:
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+@functools.lru_cache(maxsize=None)
+def _load_etree():
+    """Return lxml.etree when installed, else the stdlib ElementTree."""
+    try:
+        from lxml import etree
+        return etree
+    except ImportError:
+        import xml.etree.ElementTree as etree
+        return etree
+
+
+def _encode_pdf(pdf_path, size):
+    """
+    Base64-encode the PDF chunk by chunk so it is never held in full.
+    The file is memory-mapped, so chunks are read straight from the page
+    cache rather than copied into bytes objects first.
+    """
+    if size == 0:
+        return ''
+    
+    # Size the output up front so it is filled in place, never regrown
+    buf = bytearray(4 * ((size + 2) // 3))
+    pos = 0
+    with open(pdf_path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+            memoryview(mm) as view:
+        for start in range(0, len(view), _PDF_CHUNK_SIZE):
+            encoded = binascii.b2a_base64(view[start:start + _PDF_CHUNK_SIZE], newline=False)
+            buf[pos:pos + len(encoded)] = encoded
+            pos += len(encoded)
+    
+    # Base64 is pure ASCII, so skip the UTF-8 decoder
+    del buf[pos:]
+    return buf.decode('ascii')
+
+
+def _read_until_testplan_end(text_stream):
+    """
+    Join streamed text, stopping after the chunk that closes </testplan>.
+    Only the tail of the previous chunk is rescanned, in case the tag is
+    split across chunks.
+    """
+    chunks = []
+    tail = ''
+    for text in text_stream:
+        chunks.append(text)
+        window = tail + text
+        if _CLOSE_TESTPLAN in window:
+            break
+        tail = window[-_CLOSE_TESTPLAN_LEN:]
+    
+    return ''.join(chunks)
+
+
+class _RateLimiter:
+    """Space calls so at most `rate` start per `period` seconds, across threads."""
+    
+    def __init__(self, rate, period=60.0):
+        self.interval = period / rate
+        self.lock = threading.Lock()
+        self.next_start = 0.0
+    
+    def wait(self):
+        """Block until the caller's slot comes up."""
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        
+        if start > now:
+            time.sleep(start - now)
+
+
+def _cache_dir():
+    """Directory for cached results: $XDG_CACHE_HOME/vega or ~/.cache/vega."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'vega')
+
+
+def _pdf_sha256(pdf_path):
+    """Hex SHA-256 of the PDF, read in chunks."""
+    with open(pdf_path, 'rb') as f:
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+        digest = hashlib.sha256()
+        while chunk := f.read(_PDF_CHUNK_SIZE):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+
+def _default_output_path(pdf_path):
+    """Return <pdf base>_testplan.xtp for a path already known to end in .pdf."""
+    return pdf_path.rsplit('.', 1)[0] + '_testplan.xtp'
 
 
 class VegaEngine:
@@ -20,7 +303,7 @@ class VegaEngine:
     Multi-model verification test plan generator.
     """
     
-    SUPPORTED_MODELS = ['claude', 'openai', 'openai-assistant']
+    SUPPORTED_MODELS = SUPPORTED_MODELS
     
     def __init__(self, model='claude', api_key=None):
         """
@@ -38,12 +321,8 @@ class VegaEngine:
             self.model = 'claude'
         
         # Get appropriate API key
-        if self.model == 'claude':
-            self.api_key = api_key or os.getenv('ANTHROPIC_API_KEY')
-            self.key_name = 'ANTHROPIC_API_KEY'
-        else:
-            self.api_key = api_key or os.getenv('OPENAI_API_KEY')
-            self.key_name = 'OPENAI_API_KEY'
+        self.key_name = MODEL_API_KEYS[self.model]
+        self.api_key = api_key or os.environ.get(self.key_name)
         
         if not self.api_key:
             print("")
@@ -59,28 +338,54 @@ class VegaEngine:
     
     def read_pdf(self, pdf_path):
         """Read PDF and convert to base64."""
-        if not os.path.exists(pdf_path):
+        size = self._validate_pdf(pdf_path)
+        if size is None:
+            return None
+        
+        return _encode_pdf(pdf_path, size)
+    
+    def _validate_pdf(self, pdf_path):
+        """Check the PDF exists and report it. Returns size in bytes or None."""
+        # One stat serves both the existence check and the size report;
+        # any OSError (missing, not a directory, no permission) means unusable
+        try:
+            size = os.stat(pdf_path).st_size
+        except OSError:
             print(f"ERROR: File not found: {pdf_path}")
             return None
         
         if not pdf_path.lower().endswith('.pdf'):
             print(f"ERROR: Not a PDF file: {pdf_path}")
             return None
-
-        with open(pdf_path, 'rb') as f:
-            pdf_bytes = f.read()
-        
-        self.pdf_bytes = pdf_bytes  # Store for OpenAI Assistant
-        pdf_base64 = base64.standard_b64encode(pdf_bytes).decode('utf-8')
         
         print(f"Read PDF: {pdf_path}")
-        print(f"Size: {len(pdf_bytes) / 1024:.1f} KB")
+        print(f"Size: {size / 1024:.1f} KB")
         
-        return pdf_base64
+        return size
     
-    def generate_xtp(self, pdf_path, output_path=None):
+    def _is_current(self, output_path, pdf_path):
+        """True if output_path is newer than the PDF and holds a valid XTP."""
+        try:
+            if os.stat(output_path).st_mtime_ns <= os.stat(pdf_path).st_mtime_ns:
+                return False
+            with open(output_path, encoding='utf-8') as f:
+                xml_text = f.read()
+        except (OSError, UnicodeDecodeError):
+            return False
+        
+        return self._validate_xml(xml_text)[0]
+    
+    def generate_xtp(self, pdf_path, output_path=None, skip_current=False,
+                     use_cache=True):
         """
         Main function: Generate XTP using selected model.
+        
+        With skip_current=True, an existing output that is newer than the
+        PDF and passes validation is kept and no model call is made.
+        
+        With use_cache=True, valid results are stored under the user cache
+        directory keyed by the PDF's SHA-256 and model, and reused when the
+        same PDF is processed again.
         """
         print("")
         print("=" * 60)
@@ -93,14 +398,34 @@ class VegaEngine:
             print("ERROR: No API key configured.")
             return False
         
-        # Read PDF
         print("\n[1/3] Reading PDF...")
-        pdf_base64 = self.read_pdf(pdf_path)
-        
-        if pdf_base64 is None:
+        size = self._validate_pdf(pdf_path)
+        if size is None:
             return False
         
         filename = os.path.basename(pdf_path)
+        output_path = output_path or _default_output_path(pdf_path)
+        
+        # Checked before encoding so an up-to-date PDF is never read
+        if skip_current and self._is_current(output_path, pdf_path):
+            print(f"Up to date: {output_path}")
+            return True
+        
+        # Hash and look up before encoding so a cache hit never encodes
+        cache_path = self._cache_path(pdf_path) if use_cache else None
+        if cache_path:
+            cached = self._read_cached_xtp(cache_path)
+            if cached is not None:
+                print(f"Using cached result: {cache_path}")
+                _write_file(output_path, cached)
+                print(f"Saved: {output_path}")
+                return True
+        
+        # The assistant uploads the raw file, so skip encoding
+        if self.model == 'openai-assistant':
+            pdf_base64 = None
+        else:
+            pdf_base64 = _encode_pdf(pdf_path, size)
         
         # Generate based on model
         print(f"\n[2/3] Generating with {self.model.upper()}...")
@@ -117,19 +442,15 @@ class VegaEngine:
             return False
         
         # Clean and validate
-        xtp_content = self._clean_xml(xtp_content)
-        xtp_content = self._ensure_complete_xml(xtp_content, filename)
+        xtp_content, valid = self._finish_xtp(xtp_content, filename)
         
         # Save
         print("\n[3/3] Saving XTP file...")
         
-        if output_path is None:
-            base_name = os.path.splitext(pdf_path)[0]
-            output_path = f"{base_name}_testplan.xtp"
-
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(xtp_content)
+        _write_file(output_path, xtp_content)
         
+        if cache_path and valid:
+            self._write_cached_xtp(cache_path, xtp_content)
         
         print(f"Saved: {output_path}")
         print("=" * 60)
@@ -138,6 +459,42 @@ class VegaEngine:
         
         return True
     
+    def generate_xtp_many(self, pdf_paths, max_workers=8, requests_per_minute=50):
+        """
+        Generate XTPs for several PDFs in parallel threads.
+        
+        Each PDF goes through generate_xtp with its default output path.
+        Starts are spaced so no more than requests_per_minute generations
+        begin per minute, keeping under the provider's rate limit.
+        
+        Only claude and openai are supported: openai-assistant keeps its
+        assistant and file ids on the engine, which threads would share.
+        
+        Returns:
+            dict mapping each PDF path to the generate_xtp result
+        """
+        results = {path: False for path in pdf_paths}
+        if self.model == 'openai-assistant':
+            print("ERROR: generate_xtp_many does not support openai-assistant")
+            return results
+        
+        limiter = _RateLimiter(requests_per_minute)
+        
+        def one(pdf_path):
+            limiter.wait()
+            return self.generate_xtp(pdf_path)
+        
+        with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {executor.submit(one, path): path for path in pdf_paths}
+            for future in futures.as_completed(pending):
+                pdf_path = pending[future]
+                try:
+                    results[pdf_path] = future.result()
+                except Exception as e:
+                    print(f"  {pdf_path}: ERROR: {e}")
+        
+        return results
+    
     # =========================================================================
     # CLAUDE
     # =========================================================================
@@ -145,44 +502,231 @@ class VegaEngine:
     def _generate_with_claude(self, pdf_base64, filename):
         """Generate XTP using Claude API."""
         try:
-            import anthropic
-            
             client = anthropic.Anthropic(api_key=self.api_key)
-            prompt = self._build_prompt(filename)
+            messages = self._claude_messages(pdf_base64, filename)
             
             print("  Calling Claude API...")
             print("  (This may take 30-60 seconds)")
             
-            message = client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=8000,
-                messages=[
+            response_text = self._stream_claude(client, messages)
+            
+            # A refusal or clarifying question has no plan to salvage
+            if '<testplan' not in response_text:
+                print("  ERROR: Response contains no <testplan>; the model did not produce a test plan")
+                return None
+            
+            print("  Response received!")
+            return response_text
+            
+        except ImportError:
+            print("  ERROR: anthropic package not installed")
+            print("  Run: pip install anthropic")
+            return None
+            
+        except Exception as e:
+            print(f"  ERROR: {e}")
+            return None
+    
+    def _stream_claude(self, client, messages):
+        """Stream one Claude reply, cutting it off once </testplan> arrives."""
+        stream = client.messages.stream(
+            model=_CLAUDE_MODEL,
+            max_tokens=_CLAUDE_MAX_TOKENS,
+            messages=messages
+        )
+        
+        with stream as events:
+            return _read_until_testplan_end(events.text_stream)
+    
+    def _claude_messages(self, pdf_base64, filename):
+        """Build the Claude messages list: the PDF document, then the prompt."""
+        return [
+            {
+                "role": "user",
+                "content": [
                     {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "document",
-                                "source": {
-                                    "type": "base64",
-                                    "media_type": "application/pdf",
-                                    "data": pdf_base64
-                                }
-                            },
-                            {
-                                "type": "text",
-                                "text": prompt
-                            }
-                        ]
+                        "type": "document",
+                        "source": {
+                            "type": "base64",
+                            "media_type": "application/pdf",
+                            "data": pdf_base64
+                        }
+                    },
+                    {
+                        "type": "text",
+                        "text": self._build_prompt(filename)
                     }
                 ]
-            )
+            }
+        ]
+    
+    def generate_xtp_batch(self, pdf_paths):
+        """
+        Generate XTPs for several PDFs through the Claude Message Batches API.
+        
+        Batches are billed at half the normal rate but may take minutes to
+        hours to finish, so use this for non-interactive runs. Each XTP is
+        written next to its PDF as <name>_testplan.xtp.
+        
+        Returns:
+            dict mapping each PDF path to True (saved) or False (failed)
+        """
+        results = {path: False for path in pdf_paths}
+        
+        if not self._require_claude("Batch generation"):
+            return results
+        
+        # custom_id must be short and alphanumeric, so map ids back to paths
+        requests = []
+        by_id = {}
+        for i, pdf_path in enumerate(pdf_paths):
+            pdf_base64 = self.read_pdf(pdf_path)
+            if pdf_base64 is None:
+                continue
             
-            print("  Response received!")
-            return message.content[0].text
+            custom_id = f"pdf_{i}"
+            by_id[custom_id] = pdf_path
+            filename = os.path.basename(pdf_path)
+            requests.append({
+                "custom_id": custom_id,
+                "params": {
+                    "model": _CLAUDE_MODEL,
+                    "max_tokens": _CLAUDE_MAX_TOKENS,
+                    "messages": self._claude_messages(pdf_base64, filename)
+                }
+            })
+        
+        if not requests:
+            print("ERROR: No readable PDFs to submit.")
+            return results
+        
+        try:
+            client = anthropic.Anthropic(api_key=self.api_key)
+            
+            batch = client.messages.batches.create(requests=requests)
+            print(f"  Batch submitted: {batch.id} ({len(requests)} PDFs)")
+            
+            while batch.processing_status != 'ended':
+                print(f"    Status: {batch.processing_status}...")
+                time.sleep(_BATCH_POLL_INTERVAL)
+                batch = client.messages.batches.retrieve(batch.id)
+            
+            for entry in client.messages.batches.results(batch.id):
+                pdf_path = by_id.get(entry.custom_id)
+                if pdf_path is None:
+                    continue
+                
+                if entry.result.type != 'succeeded':
+                    print(f"  {pdf_path}: {entry.result.type}")
+                    continue
+                
+                # A bad entry (empty reply, failed write) must not drop
+                # the results after it
+                try:
+                    filename = os.path.basename(pdf_path)
+                    xtp_content, _ = self._finish_xtp(
+                        entry.result.message.content[0].text, filename
+                    )
+                    
+                    output_path = _default_output_path(pdf_path)
+                    _write_file(output_path, xtp_content)
+                except Exception as e:
+                    print(f"  {pdf_path}: ERROR: {e}")
+                    continue
+                
+                print(f"  Saved: {output_path}")
+                results[pdf_path] = True
             
         except Exception as e:
             print(f"  ERROR: {e}")
-            return None
+        
+        return results
+    
+    async def _generate_with_claude_async(self, client, pdf_base64, filename):
+        """Generate XTP text for one PDF with an AsyncAnthropic client."""
+        message = await client.messages.create(
+            model=_CLAUDE_MODEL,
+            max_tokens=_CLAUDE_MAX_TOKENS,
+            messages=self._claude_messages(pdf_base64, filename)
+        )
+        return message.content[0].text
+    
+    async def generate_xtp_many_async(self, pdf_paths, concurrency=8):
+        """
+        Generate XTPs for several PDFs with concurrent Claude requests.
+        
+        At most `concurrency` requests are in flight at once. Up to another
+        `concurrency` PDFs are read and encoded ahead while those requests
+        run, so each free slot starts its call immediately. File reads and
+        writes run in worker threads so they do not stall the event loop.
+        Each XTP is written next to its PDF as <name>_testplan.xtp.
+        
+        Returns:
+            dict mapping each PDF path to True (saved) or False (failed)
+        """
+        results = {path: False for path in pdf_paths}
+        
+        if not self._require_claude("Concurrent generation"):
+            return results
+        
+        calls = asyncio.Semaphore(concurrency)
+        prefetch = asyncio.Semaphore(concurrency)
+        
+        async def process(client, pdf_path):
+            # Read while waiting for a call slot; the prefetch bound keeps
+            # encoded PDFs in memory to about 2x concurrency
+            async with prefetch:
+                pdf_base64 = await asyncio.to_thread(self.read_pdf, pdf_path)
+                if pdf_base64 is None:
+                    return
+                await calls.acquire()
+            
+            try:
+                filename = os.path.basename(pdf_path)
+                xtp_content = await self._generate_with_claude_async(
+                    client, pdf_base64, filename
+                )
+            finally:
+                calls.release()
+            
+            xtp_content, _ = self._finish_xtp(xtp_content, filename)
+            
+            output_path = _default_output_path(pdf_path)
+            await asyncio.to_thread(_write_file, output_path, xtp_content)
+            print(f"  Saved: {output_path}")
+            results[pdf_path] = True
+        
+        async def one(client, pdf_path):
+            # A failure on one PDF must not abort the others
+            try:
+                await process(client, pdf_path)
+            except Exception as e:
+                print(f"  {pdf_path}: ERROR: {e}")
+        
+        async with anthropic.AsyncAnthropic(api_key=self.api_key) as client:
+            await asyncio.gather(*(one(client, path) for path in pdf_paths))
+        
+        return results
+    
+    def _require_claude(self, feature):
+        """Check this engine can make multi-PDF Claude calls; print why not."""
+        if self.model != 'claude':
+            print(f"ERROR: {feature} requires the claude model, not {self.model}")
+            return False
+        
+        if not self.api_key:
+            print("ERROR: No API key configured.")
+            return False
+        
+        # Touching the lazy module imports it
+        try:
+            anthropic.Anthropic
+        except ImportError:
+            print("ERROR: anthropic package not installed")
+            print("Run: pip install anthropic")
+            return False
+        
+        return True
     
     # =========================================================================
     # OPENAI GPT-4
@@ -191,9 +735,7 @@ class VegaEngine:
     def _generate_with_openai(self, pdf_base64, filename):
         """Generate XTP using OpenAI GPT-4."""
         try:
-            from openai import OpenAI
-            
-            client = OpenAI(api_key=self.api_key)
+            client = _openai.OpenAI(api_key=self.api_key)
             prompt = self._build_prompt(filename)
             
             print("  Calling OpenAI API...")
@@ -205,7 +747,7 @@ class VegaEngine:
             print("  For large PDFs, use --model openai-assistant")
             
             response = client.chat.completions.create(
-                model="gpt-4o",
+                model=_OPENAI_MODEL,
                 max_tokens=8000,
                 messages=[
                     {
@@ -223,6 +765,11 @@ class VegaEngine:
             print("  Response received!")
             return response.choices[0].message.content
             
+        except ImportError:
+            print("  ERROR: openai package not installed")
+            print("  Run: pip install openai")
+            return None
+            
         except Exception as e:
             print(f"  ERROR: {e}")
             return None
@@ -238,9 +785,7 @@ class VegaEngine:
         Best for large specifications.
         """
         try:
-            from openai import OpenAI
-            
-            client = OpenAI(api_key=self.api_key)
+            client = _openai.OpenAI(api_key=self.api_key)
             
             # Step 1: Upload the PDF file
             print("  Uploading PDF to OpenAI...")
@@ -256,11 +801,8 @@ class VegaEngine:
             print("  Creating assistant...")
             assistant = client.beta.assistants.create(
                 name="VEGA XTP Generator",
-                instructions="""You are an expert hardware verification engineer.
-Your task is to analyze hardware specifications and generate comprehensive XML test plans.
-Always output valid XML. Include requirements, test suites, and test cases.
-Reference page numbers from the source document.""",
-                model="gpt-4o",
+                instructions=_ASSISTANT_INSTRUCTIONS,
+                model=_OPENAI_MODEL,
                 tools=[{"type": "file_search"}]
             )
             self.assistant_id = assistant.id
@@ -304,7 +846,8 @@ Reference page numbers from the source document.""",
                 assistant_id=self.assistant_id
             )
             
-            # Poll for completion
+            # Poll for completion, backing off so fast runs return quickly
+            delay = _POLL_INITIAL_DELAY
             while True:
                 run_status = client.beta.threads.runs.retrieve(
                     thread_id=thread.id,
@@ -321,7 +864,8 @@ Reference page numbers from the source document.""",
                     return None
                 
                 print(f"    Status: {run_status.status}...")
-                time.sleep(5)
+                time.sleep(delay)
+                delay = min(delay * _POLL_BACKOFF, _POLL_MAX_DELAY)
             
             # Step 6: Get the response
             messages = client.beta.threads.messages.list(
@@ -361,97 +905,77 @@ Reference page numbers from the source document.""",
     # SHARED UTILITIES
     # =========================================================================
     
-    def _build_prompt(self, filename):
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def _build_prompt(filename):
         """Build the prompt for any model."""
-        return f"""Analyze the specification document: {filename}
-
-Generate a comprehensive XTP (XML Test Plan) with:
-1. All requirements extracted from the document
-2. Test suites for each feature
-3. Test cases with stimulus and expected results
-4. Cross-feature integration tests
-
-OUTPUT FORMAT (valid XML only, no markdown):
-
-<?xml version="1.0" encoding="UTF-8"?>
-<testplan name="{filename}_verification" version="1.0">
-    <metadata>
-        <author>VEGA XTP Generator</author>
-        <methodology>Cognitive Verification Architecture</methodology>
-        <book>Cognitive Verification Architecture: The VEGA Framework by Vikash</book>
-        <source>{filename}</source>
-    </metadata>
+        return _PROMPT_TMPL.format(filename=filename)
     
-    <requirements>
-        <requirement id="REQ_001" source="page X">[Requirement]</requirement>
-    </requirements>
+    def _finish_xtp(self, response, filename):
+        """
+        Clean and complete a model response, warning if it is not a valid
+        XTP. Returns (xtp_content, valid).
+        """
+        xtp_content = self._clean_xml(response)
+        xtp_content = self._ensure_complete_xml(xtp_content, filename)
+        
+        valid, error = self._validate_xml(xtp_content)
+        if not valid:
+            print(f"  WARNING: {filename}: {error}")
+        
+        return xtp_content, valid
     
-    <test_suite name="[feature]_tests">
-        <test_case id="TC_001" name="[name]">
-            <objective>[objective]</objective>
-            <source>Page X</source>
-            <preconditions>
-                <condition>[condition]</condition>
-            </preconditions>
-            <stimulus>
-                <step order="1">[step]</step>
-                <step order="2">[step]</step>
-            </stimulus>
-            <expected_results>
-                <result>[result]</result>
-            </expected_results>
-            <pass_criteria>[criteria]</pass_criteria>
-        </test_case>
-    </test_suite>
+    # =========================================================================
+    # RESULT CACHE
+    # =========================================================================
     
-    <test_suite name="cross_feature_tests">
-        <test_case id="TC_CF_001" name="[cross-feature test]">
-            <objective>[Test interaction between features]</objective>
-            <features_involved>[Feature A, Feature B]</features_involved>
-            <stimulus>
-                <step order="1">[step]</step>
-            </stimulus>
-            <expected_results>
-                <result>[result]</result>
-            </expected_results>
-        </test_case>
-    </test_suite>
-</testplan>
-
-IMPORTANT:
-- Extract ALL requirements
-- Include timing from diagrams
-- Reference page numbers
-- Include cross-feature tests
-- Output ONLY valid XML, no explanations"""
+    def _cache_path(self, pdf_path):
+        """Cache file for this PDF's content and model, or None if unreadable."""
+        try:
+            digest = _pdf_sha256(pdf_path)
+        except OSError:
+            return None
+        return os.path.join(_cache_dir(), f"{digest}-{self.model}-{_CACHE_VERSIONS[self.model]}.xtp")
+    
+    def _read_cached_xtp(self, cache_path):
+        """Return the cached XTP if present and valid, else None."""
+        try:
+            with open(cache_path, encoding='utf-8') as f:
+                xml_text = f.read()
+        except (OSError, UnicodeDecodeError):
+            return None
+        
+        if not self._validate_xml(xml_text)[0]:
+            return None
+        return xml_text
+    
+    def _write_cached_xtp(self, cache_path, xtp_content):
+        """Store a valid XTP in the cache; failures only warn."""
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            _write_file(cache_path, xtp_content)
+        except OSError as e:
+            print(f"  Cache warning: {e}")
     
     def _clean_xml(self, response):
         """Remove markdown wrappers."""
-        import re
-        
         if response is None:
             return ""
         
         text = response.strip()
         
-        # Remove ```xml wrapper
-        match = re.search(r'```xml\s*(.*?)\s*```', text, re.DOTALL)
-        if match:
-            return match.group(1).strip()
-        
-        # Remove ``` wrapper
-        match = re.search(r'```\s*(.*?)\s*```', text, re.DOTALL)
-        if match:
-            return match.group(1).strip()
+        if '```' not in text:
+            # Already a bare document, or nothing the patterns could match
+            if text.startswith('<?xml') and text.endswith('</testplan>'):
+                return text
+            if '</testplan>' not in text:
+                return text
         
-        # Extract XML if mixed with text
-        match = re.search(r'(<\?xml.*</testplan>)', text, re.DOTALL)
-        if match:
-            return match.group(1).strip()
-        
-        match = re.search(r'(<testplan.*</testplan>)', text, re.DOTALL)
-        if match:
-            return match.group(1).strip()
+        # Remove ```xml / ``` wrapper, or extract XML mixed with text
+        for pattern in _RE_XTP_PATTERNS:
+            match = pattern.search(text)
+            if match:
+                return match.group(1).strip()
         
         return text
     
@@ -464,34 +988,68 @@ IMPORTANT:
         if not xml_text.strip().startswith('<?xml'):
             xml_text = '<?xml version="1.0" encoding="UTF-8"?>\n' + xml_text
         
-        # Check for incomplete testplan
-        if '<testplan' in xml_text and '</testplan>' not in xml_text:
+        # Check for incomplete testplan (close tag searched only after open)
+        start = xml_text.find('<testplan')
+        if start >= 0 and xml_text.find('</testplan>', start) < 0:
             # Try to find a good cutoff point
-            last_close = xml_text.rfind('</test_case>')
+            last_close = xml_text.rfind(_CLOSE_TEST_CASE)
             if last_close > 0:
-                xml_text = xml_text[:last_close + len('</test_case>')]
-            xml_text += '\n    </test_suite>\n</testplan>'
+                xml_text = xml_text[:last_close + _CLOSE_TEST_CASE_LEN] + _CLOSE_TESTPLAN_TAIL
+            else:
+                xml_text += _CLOSE_TESTPLAN_TAIL
         
         return xml_text
     
+    def _validate_xml(self, xml_text):
+        """
+        Check the text parses and has a testplan root with at least one
+        test_suite and test_case. Returns (True, None) or (False, reason).
+        """
+        # Cheap substring checks catch the common failures without parsing
+        if not xml_text.rstrip().endswith('</testplan>'):
+            return False, "Truncated: missing </testplan>"
+        if '<test_suite' not in xml_text:
+            return False, "No test_suite elements"
+        if '<test_case' not in xml_text:
+            return False, "No test_case elements"
+        
+        # Stream the parse, dropping each finished subtree, so memory stays
+        # flat; the whole document is still read to confirm it is well-formed
+        etree = _load_etree()
+        root = None
+        depth = 0
+        has_suite = has_case = False
+        try:
+            events = etree.iterparse(
+                io.BytesIO(xml_text.encode('utf-8')), events=('start', 'end')
+            )
+            for event, elem in events:
+                if event == 'start':
+                    if root is None:
+                        root = elem
+                        if root.tag != 'testplan':
+                            return False, f"Root element is '{root.tag}', expected 'testplan'"
+                    elif elem.tag == 'test_suite':
+                        has_suite = True
+                    elif elem.tag == 'test_case':
+                        has_case = True
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 1:
+                        root.clear()
+        except etree.ParseError as e:
+            return False, f"XML parse error: {e}"
+        
+        if has_suite and has_case:
+            return True, None
+        if not has_suite:
+            return False, "No test_suite elements"
+        return False, "No test_case elements"
+    
     def _create_empty_xtp(self, filename):
         """Create minimal valid XTP if generation fails."""
-        return f'''<?xml version="1.0" encoding="UTF-8"?>
-<testplan name="{filename}_verification" version="1.0">
-    <metadata>
-        <author>VEGA XTP Generator</author>
-        <source>{filename}</source>
-        <note>Generation incomplete - please retry</note>
-    </metadata>
-    <requirements>
-        <requirement id="REQ_001" source="manual">Review specification manually</requirement>
-    </requirements>
-    <test_suite name="placeholder_tests">
-        <test_case id="TC_001" name="placeholder">
-            <objective>Placeholder - generation incomplete</objective>
-        </test_case>
-    </test_suite>
-</testplan>'''
+        return _EMPTY_XTP_TMPL.format(filename=filename)
 
 
 if __name__ == "__main__":